@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-from wsgiref.simple_server import make_server
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, make_server
 
 from jmail import create_app
 
 app = create_app()
 
 
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
 if __name__ == "__main__":
-    with make_server("0.0.0.0", 8000, app) as server:
+    with make_server("0.0.0.0", 8000, app, server_class=ThreadingWSGIServer) as server:
         print("Serving on http://0.0.0.0:8000")
         server.serve_forever()
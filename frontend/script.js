@@ -116,7 +116,7 @@ composeForm.addEventListener("submit", async (event) => {
       method: "POST",
       body: JSON.stringify({ to, subject, reply_to, body }),
     });
-    showMessage(composeMessage, "Email sent successfully!");
+    showMessage(composeMessage, "Email queued for delivery!");
     composeForm.reset();
   } catch (error) {
     showMessage(composeMessage, error.message, true);
@@ -1,15 +1,25 @@
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
+import heapq
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Any, Callable
 
 from .auth import authenticate_user, decode_token, register_user, row_to_dict, validate_email
 from .config import AppConfig, load_config
 from .database import Database
-from .email_service import EmailConfigurationError, send_email
+from .email_service import EmailConfigurationError, ensure_email_configured, send_email
 from .http import Request, Response, build_request, json_response, to_wsgi
 
+logger = logging.getLogger(__name__)
+
+OutboxJob = tuple[int, str, str, str, str | None]
+
 
 class HTTPError(Exception):
     def __init__(self, message: str, status: int) -> None:
@@ -34,14 +44,112 @@ class ConflictError(HTTPError):
 
 @dataclass(slots=True)
 class JmailApplication:
+    SEND_RETRY_DELAY_SECONDS = 2.0
+
     config: AppConfig
     db: Database
+    _kdf_pool: ThreadPoolExecutor = field(init=False, repr=False, compare=False)
+    _routes: dict[tuple[str, str], Callable[[Request], Response]] = field(
+        init=False, repr=False, compare=False
+    )
+    _send_queue: queue.Queue[OutboxJob | None] = field(init=False, repr=False, compare=False)
+    _send_thread: threading.Thread = field(init=False, repr=False, compare=False)
+    _pid: int = field(init=False, repr=False, compare=False)
+    _workers_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _health_response: Response = field(
+        default_factory=lambda: json_response({"status": "ok"}), init=False, repr=False, compare=False
+    )
+    _health_wsgi: tuple[str, list[tuple[str, str]], bytes] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._health_wsgi = to_wsgi(self._health_response)
+        self._routes = {
+            ("GET", "/api/health"): self.handle_health,
+            ("POST", "/api/register"): self.handle_register,
+            ("POST", "/api/login"): self.handle_login,
+            ("GET", "/api/profile"): self.handle_profile,
+            ("POST", "/api/send"): self.handle_send,
+        }
+        self._start_workers()
+
+    def _start_workers(self) -> None:
+        self._kdf_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="jmail-kdf")
+        send_queue: queue.Queue[OutboxJob | None] = queue.Queue()
+        for row in self.db.get_pending_emails():
+            send_queue.put(row)
+        self._send_queue = send_queue
+        self._send_thread = threading.Thread(
+            target=self._send_worker, args=(send_queue,), name="jmail-send", daemon=True
+        )
+        self._send_thread.start()
+        self._pid = os.getpid()
+
+    def _ensure_workers(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._workers_lock:
+            if self._pid != os.getpid():
+                self._start_workers()
+
+    def _send_worker(self, send_queue: queue.Queue[OutboxJob | None]) -> None:
+        retries: list[tuple[float, int, OutboxJob]] = []
+        while True:
+            timeout = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+            try:
+                job = send_queue.get(timeout=timeout)
+            except queue.Empty:
+                job = heapq.heappop(retries)[2]
+            if job is None:
+                for _ in range(len(retries) + 1):
+                    send_queue.task_done()
+                return
+            delay = self._deliver(job)
+            if delay is None:
+                send_queue.task_done()
+            else:
+                heapq.heappush(retries, (time.monotonic() + delay, job[0], job))
+
+    def _deliver(self, job: OutboxJob) -> float | None:
+        email_id, recipient, subject, body, reply_to = job
+        try:
+            attempts = self.db.claim_email(email_id)
+            if attempts is None:
+                return None
+            try:
+                send_email(config=self.config, recipient=recipient, subject=subject, body=body, reply_to=reply_to)
+            except Exception:
+                self.db.release_email(email_id)
+                if attempts >= self.db.OUTBOX_MAX_ATTEMPTS:
+                    logger.exception("Giving up on queued email %s after %s attempts", email_id, attempts)
+                    return None
+                logger.exception("Failed to send queued email %s (attempt %s), retrying", email_id, attempts)
+                return self.SEND_RETRY_DELAY_SECONDS * 2 ** (attempts - 1)
+            self.db.mark_email_sent(email_id)
+        except Exception:
+            logger.exception("Failed to process queued email %s", email_id)
+        return None
+
+    def flush_outbox(self) -> None:
+        self._send_queue.join()
+
+    def close(self) -> None:
+        if self._send_thread.is_alive():
+            self._send_queue.put(None)
+            self._send_thread.join()
+        self._kdf_pool.shutdown()
+        self.db.close()
 
     def __call__(
         self,
         environ: dict[str, Any],
         start_response: Callable[[str, list[tuple[str, str]]], Callable[[bytes], None]] | Callable[[str, list[tuple[str, str]]], None],
     ):
+        if environ.get("PATH_INFO") == "/api/health" and environ.get("REQUEST_METHOD") == "GET":
+            status, headers, body = self._health_wsgi
+            start_response(status, list(headers))
+            return [body]
+
+        self._ensure_workers()
         request = build_request(environ)
         try:
             response = self.dispatch(request)
@@ -56,35 +164,31 @@ class JmailApplication:
         return [body]
 
     def dispatch(self, request: Request) -> Response:
-        if request.path == "/api/health" and request.method == "GET":
-            return json_response({"status": "ok"})
-        if request.path == "/api/register" and request.method == "POST":
-            return self.handle_register(request)
-        if request.path == "/api/login" and request.method == "POST":
-            return self.handle_login(request)
-        if request.path == "/api/profile" and request.method == "GET":
-            return self.handle_profile(request)
-        if request.path == "/api/send" and request.method == "POST":
-            return self.handle_send(request)
-        return json_response({"error": "Not found"}, status=404)
-
-    def _parse_json(self, request: Request) -> dict[str, Any]:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            return json_response({"error": "Not found"}, status=404)
+        return handler(request)
+
+    def _parse_json(self, request: Request, *names: str) -> tuple[Any, ...]:
         try:
-            return request.json()
-        except json.JSONDecodeError as exc:
+            return request.json_fields(*names)
+        except ValueError as exc:
             raise BadRequestError("Invalid JSON payload") from exc
 
+    def handle_health(self, request: Request) -> Response:
+        return self._health_response
+
     def handle_register(self, request: Request) -> Response:
-        payload = self._parse_json(request)
-        email = payload.get("email", "").strip().lower()
-        password = payload.get("password", "")
-        display_name = payload.get("display_name")
+        email, password, display_name = self._parse_json(request, "email", "password", "display_name")
+        email = (email or "").strip().lower()
 
         if not email or not password:
             raise BadRequestError("Email and password are required")
         try:
             validate_email(email)
-            result = register_user(self.db, email, password, display_name, self.config)
+            result = register_user(
+                self.db, email, password, display_name, self.config, executor=self._kdf_pool
+            )
         except ValueError as exc:
             message = str(exc)
             if "already" in message:
@@ -94,14 +198,13 @@ class JmailApplication:
         return json_response({"token": result.token, "user": result.user})
 
     def handle_login(self, request: Request) -> Response:
-        payload = self._parse_json(request)
-        email = payload.get("email", "").strip().lower()
-        password = payload.get("password", "")
+        email, password = self._parse_json(request, "email", "password")
+        email = (email or "").strip().lower()
 
         if not email or not password:
             raise BadRequestError("Email and password are required")
         try:
-            result = authenticate_user(self.db, email, password, self.config)
+            result = authenticate_user(self.db, email, password, self.config, executor=self._kdf_pool)
         except ValueError as exc:
             raise UnauthorizedError(str(exc)) from exc
 
@@ -109,9 +212,9 @@ class JmailApplication:
 
     def _require_user(self, request: Request) -> dict[str, Any]:
         auth_header = request.headers.get("Authorization", "")
-        if not auth_header.startswith("Bearer "):
+        if len(auth_header) < 8 or auth_header[:7] != "Bearer ":
             raise UnauthorizedError("Missing Authorization header")
-        token = auth_header.split(" ", 1)[1]
+        token = auth_header[7:]
         try:
             payload = decode_token(token, config=self.config)
         except ValueError as exc:
@@ -130,11 +233,10 @@ class JmailApplication:
 
     def handle_send(self, request: Request) -> Response:
         self._require_user(request)
-        payload = self._parse_json(request)
-        recipient = payload.get("to", "").strip()
-        subject = payload.get("subject", "").strip()
-        body = payload.get("body", "").strip()
-        reply_to = payload.get("reply_to")
+        recipient, subject, body, reply_to = self._parse_json(request, "to", "subject", "body", "reply_to")
+        recipient = (recipient or "").strip()
+        subject = (subject or "").strip()
+        body = (body or "").strip()
 
         if not recipient or not subject or not body:
             raise BadRequestError("Recipient, subject, and body are required")
@@ -145,8 +247,10 @@ class JmailApplication:
         except ValueError as exc:
             raise BadRequestError(str(exc)) from exc
 
-        send_email(config=self.config, recipient=recipient, subject=subject, body=body, reply_to=reply_to)
-        return json_response({"status": "sent"})
+        ensure_email_configured(self.config)
+        email_id = self.db.enqueue_email(recipient=recipient, subject=subject, body=body, reply_to=reply_to)
+        self._send_queue.put((email_id, recipient, subject, body, reply_to))
+        return json_response({"status": "queued"}, status=202)
 
 
 def create_app(config: AppConfig | None = None) -> JmailApplication:
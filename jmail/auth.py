@@ -1,19 +1,33 @@
 from __future__ import annotations
 
 import base64
+import binascii
+import functools
 import hmac
-import json
 import os
-import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Executor
 from dataclasses import dataclass
 from hashlib import pbkdf2_hmac, sha256
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 from .config import AppConfig
-from .database import Database
+from .database import Database, UserRow
+from .http import dumps_json, loads_json
 
-EMAIL_REGEX = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+try:  # pragma: no cover - optional accelerated backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:  # pragma: no cover
+    PBKDF2HMAC = None
+
+PBKDF2_ITERATIONS = 120_000
+
+TOKEN_CACHE_SIZE = 4096
+_TOKEN_CACHE: OrderedDict[tuple[bytes, str], tuple[Dict[str, Any], float]] = OrderedDict()
+_TOKEN_CACHE_LOCK = threading.Lock()
 
 
 @dataclass(slots=True)
@@ -22,8 +36,11 @@ class AuthResult:
     user: Dict[str, Any]
 
 
+_URLSAFE = bytes.maketrans(b"+/", b"-_")
+
+
 def _b64encode(data: bytes) -> str:
-    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+    return binascii.b2a_base64(data, newline=False).rstrip(b"=").translate(_URLSAFE).decode("ascii")
 
 
 def _b64decode(data: str) -> bytes:
@@ -31,9 +48,16 @@ def _b64decode(data: str) -> bytes:
     return base64.urlsafe_b64decode(data + padding)
 
 
+def _pbkdf2(password: bytes, salt: bytes, iterations: int = PBKDF2_ITERATIONS) -> bytes:
+    if PBKDF2HMAC is not None:
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+        return kdf.derive(password)
+    return pbkdf2_hmac("sha256", password, salt, iterations)
+
+
 def hash_password(password: str) -> str:
     salt = os.urandom(16)
-    hash_bytes = pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 120_000)
+    hash_bytes = _pbkdf2(password.encode("utf-8"), salt)
     return f"{_b64encode(salt)}${_b64encode(hash_bytes)}"
 
 
@@ -44,78 +68,127 @@ def verify_password(password: str, stored: str) -> bool:
         return False
     salt = _b64decode(salt_b64)
     expected = _b64decode(hash_b64)
-    actual = pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 120_000)
+    actual = _pbkdf2(password.encode("utf-8"), salt)
     return hmac.compare_digest(expected, actual)
 
 
+def _run_kdf(executor: Executor | None, func: Callable[..., Any], *args: Any) -> Any:
+    if executor is None:
+        return func(*args)
+    return executor.submit(func, *args).result()
+
+
+_HEADER_B64 = _b64encode(dumps_json({"alg": "HS256", "typ": "JWT"}))
+
+
+@functools.lru_cache(maxsize=4)
+def _hmac_template(secret: bytes) -> hmac.HMAC:
+    return hmac.new(secret, b"", sha256)
+
+
+def _sign(secret: bytes, signing_input: bytes) -> bytes:
+    mac = _hmac_template(secret).copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
 def generate_token(*, user_id: int, config: AppConfig) -> str:
-    header = {"alg": "HS256", "typ": "JWT"}
     now = int(time.time())
     payload = {"sub": user_id, "iat": now, "exp": now + config.token_exp_seconds}
-    signing_input = ".".join(
-        _b64encode(json.dumps(part, separators=(",", ":")).encode("utf-8"))
-        for part in (header, payload)
-    )
-    signature = hmac.new(config.jwt_secret.encode("utf-8"), signing_input.encode("utf-8"), sha256).digest()
+    signing_input = f"{_HEADER_B64}.{_b64encode(dumps_json(payload))}"
+    signature = _sign(config.jwt_secret_bytes, signing_input.encode("utf-8"))
     return f"{signing_input}.{_b64encode(signature)}"
 
 
 def decode_token(token: str, *, config: AppConfig) -> Dict[str, Any]:
+    key = (config.jwt_secret_bytes, token)
+    with _TOKEN_CACHE_LOCK:
+        cached = _TOKEN_CACHE.get(key)
+        if cached is not None:
+            if time.time() < cached[1]:
+                _TOKEN_CACHE.move_to_end(key)
+                return cached[0]
+            del _TOKEN_CACHE[key]
+
     try:
         header_b64, payload_b64, signature_b64 = token.split(".")
     except ValueError as exc:
         raise ValueError("Malformed token") from exc
 
     signing_input = f"{header_b64}.{payload_b64}"
-    expected_sig = hmac.new(
-        config.jwt_secret.encode("utf-8"), signing_input.encode("utf-8"), sha256
-    ).digest()
+    expected_sig = _sign(config.jwt_secret_bytes, signing_input.encode("utf-8"))
     if not hmac.compare_digest(expected_sig, _b64decode(signature_b64)):
         raise ValueError("Invalid signature")
 
-    payload = json.loads(_b64decode(payload_b64))
-    if int(time.time()) >= int(payload.get("exp", 0)):
+    payload = loads_json(_b64decode(payload_b64))
+    expires_at = int(payload.get("exp", 0))
+    if int(time.time()) >= expires_at:
         raise ValueError("Token expired")
+
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE[key] = (payload, expires_at)
+        while len(_TOKEN_CACHE) > TOKEN_CACHE_SIZE:
+            _TOKEN_CACHE.popitem(last=False)
     return payload
 
 
+@functools.lru_cache(maxsize=8192)
 def validate_email(address: str) -> str:
-    if not EMAIL_REGEX.match(address):
+    at = address.find("@")
+    if at <= 0 or at != address.rfind("@"):
+        raise ValueError("Invalid email address")
+    dot = address.find(".", at + 2)
+    if dot < 0 or dot == len(address) - 1:
+        raise ValueError("Invalid email address")
+    if any(char.isspace() for char in address):
         raise ValueError("Invalid email address")
     return address
 
 
-def authenticate_user(db: Database, email: str, password: str, config: AppConfig) -> AuthResult:
+def authenticate_user(
+    db: Database, email: str, password: str, config: AppConfig, *, executor: Executor | None = None
+) -> AuthResult:
     row = db.get_user_by_email(email)
-    if row is None or not verify_password(password, row["password_hash"]):
+    if row is None:
+        raise ValueError("Invalid email or password")
+    user_id, _, password_hash, _, _ = row
+    if not _run_kdf(executor, verify_password, password, password_hash):
         raise ValueError("Invalid email or password")
 
-    token = generate_token(user_id=row["id"], config=config)
+    token = generate_token(user_id=user_id, config=config)
     return AuthResult(token=token, user=row_to_dict(row))
 
 
-def register_user(db: Database, email: str, password: str, display_name: str | None, config: AppConfig) -> AuthResult:
+def register_user(
+    db: Database,
+    email: str,
+    password: str,
+    display_name: str | None,
+    config: AppConfig,
+    *,
+    executor: Executor | None = None,
+) -> AuthResult:
     validate_email(email)
     if db.get_user_by_email(email) is not None:
         raise ValueError("Email already registered")
 
-    password_hash = hash_password(password)
+    password_hash = _run_kdf(executor, hash_password, password)
     user_id = db.create_user(email=email, password_hash=password_hash, display_name=display_name)
     row = db.get_user_by_id(user_id)
     token = generate_token(user_id=user_id, config=config)
     return AuthResult(token=token, user=row_to_dict(row))
 
 
-def row_to_dict(row: Any) -> Dict[str, Any]:
-    created_at = row["created_at"]
+def row_to_dict(row: UserRow) -> Dict[str, Any]:
+    user_id, email, _, display_name, created_at = row
     if hasattr(created_at, "isoformat"):
         created_at_value = created_at.isoformat()
     else:
         created_at_value = str(created_at)
     return {
-        "id": row["id"],
-        "email": row["email"],
-        "display_name": row["display_name"],
+        "id": user_id,
+        "email": email,
+        "display_name": display_name,
         "created_at": created_at_value,
     }
 
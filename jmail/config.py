@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from email.utils import formataddr
 from pathlib import Path
 
 
@@ -12,7 +13,7 @@ def _env_bool(name: str, default: bool = True) -> bool:
     return value.lower() not in {"false", "0", "no"}
 
 
-@dataclass(slots=True)
+@dataclass(slots=True, frozen=True)
 class AppConfig:
     database_path: Path
     jwt_secret: str
@@ -24,6 +25,14 @@ class AppConfig:
     smtp_use_tls: bool
     smtp_from_email: str
     smtp_from_name: str
+    jwt_secret_bytes: bytes = field(init=False, repr=False, compare=False)
+    from_header: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "jwt_secret_bytes", self.jwt_secret.encode("utf-8"))
+        object.__setattr__(
+            self, "from_header", formataddr((self.smtp_from_name, self.smtp_from_email or self.smtp_username))
+        )
 
 
 def load_config() -> AppConfig:
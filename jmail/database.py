@@ -1,61 +1,209 @@
 from __future__ import annotations
 
+import os
+import queue
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
 from pathlib import Path
-from threading import Lock
-from typing import Generator
+from typing import Any, Generator
+
+UserRow = tuple[int, str, str, str | None, Any]
 
 
 class Database:
-    def __init__(self, path: Path) -> None:
+    SQL_INIT = """
+        PRAGMA journal_mode=WAL;
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            display_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            reply_to TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            claimed_at TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            sent_at TIMESTAMP
+        );
+    """
+    SQL_CONNECTION_PRAGMAS = """
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+    """
+    SQL_INSERT_USER = "INSERT INTO users (email, password_hash, display_name) VALUES (?, ?, ?)"
+    SQL_GET_BY_EMAIL = "SELECT id, email, password_hash, display_name, created_at FROM users WHERE email = ?"
+    SQL_GET_BY_ID = "SELECT id, email, password_hash, display_name, created_at FROM users WHERE id = ?"
+    SQL_INSERT_OUTBOX = "INSERT INTO outbox (recipient, subject, body, reply_to) VALUES (?, ?, ?, ?)"
+    SQL_OUTBOX_CLAIMABLE = "sent_at IS NULL AND (claimed_at IS NULL OR claimed_at < datetime('now', ?))"
+    SQL_CLAIM_OUTBOX = (
+        "UPDATE outbox SET claimed_at = CURRENT_TIMESTAMP, attempts = attempts + 1 "
+        f"WHERE id = ? AND attempts < ? AND {SQL_OUTBOX_CLAIMABLE}"
+    )
+    SQL_GET_OUTBOX_ATTEMPTS = "SELECT attempts FROM outbox WHERE id = ?"
+    SQL_RELEASE_OUTBOX = "UPDATE outbox SET claimed_at = NULL WHERE id = ? AND sent_at IS NULL"
+    SQL_MARK_OUTBOX_SENT = "UPDATE outbox SET sent_at = CURRENT_TIMESTAMP WHERE id = ?"
+    SQL_GET_PENDING_OUTBOX = (
+        "SELECT id, recipient, subject, body, reply_to FROM outbox "
+        f"WHERE attempts < ? AND {SQL_OUTBOX_CLAIMABLE} ORDER BY id"
+    )
+    OUTBOX_CLAIM_TIMEOUT_SECONDS = 600
+    OUTBOX_MAX_ATTEMPTS = 5
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        pool_size: int = 8,
+        user_cache_size: int = 4096,
+        user_cache_ttl: float = 60.0,
+    ) -> None:
         self.path = path
-        self._lock = Lock()
+        self._pool_size = pool_size
+        self._pool_lock = threading.Lock()
+        self._reset_pool()
+        self._user_cache: OrderedDict[int, tuple[float, UserRow]] = OrderedDict()
+        self._user_cache_lock = threading.Lock()
+        self._user_cache_size = user_cache_size
+        self._user_cache_ttl = user_cache_ttl
         self._initialize()
 
     def _initialize(self) -> None:
         with self.connect() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    email TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    display_name TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-            conn.commit()
+            conn.executescript(self.SQL_INIT)
+
+    def _reset_pool(self) -> None:
+        self._pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._pool_opened = 0
+        self._pool_pid = os.getpid()
+
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,
+        )
+        conn.executescript(self.SQL_CONNECTION_PRAGMAS)
+        return conn
+
+    def _checkout(self) -> tuple[queue.LifoQueue[sqlite3.Connection], sqlite3.Connection]:
+        with self._pool_lock:
+            if self._pool_pid != os.getpid():
+                self._reset_pool()
+            pool = self._pool
+            try:
+                return pool, pool.get_nowait()
+            except queue.Empty:
+                pass
+            can_open = self._pool_opened < self._pool_size
+            if can_open:
+                self._pool_opened += 1
+        if not can_open:
+            return pool, pool.get()
+        try:
+            return pool, self._open_connection()
+        except BaseException:
+            with self._pool_lock:
+                if pool is self._pool:
+                    self._pool_opened -= 1
+            raise
 
     @contextmanager
     def connect(self) -> Generator[sqlite3.Connection, None, None]:
-        with self._lock:
-            conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES)
-        conn.row_factory = sqlite3.Row
+        pool, conn = self._checkout()
         try:
             yield conn
         finally:
-            conn.close()
+            if pool is self._pool:
+                pool.put(conn)
+            else:
+                conn.close()
+
+    def close(self) -> None:
+        with self._pool_lock:
+            while True:
+                try:
+                    self._pool.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._pool_opened -= 1
 
     def create_user(self, *, email: str, password_hash: str, display_name: str | None) -> int:
+        with self.connect() as conn:
+            cursor = conn.execute(self.SQL_INSERT_USER, (email, password_hash, display_name))
+        user_id = int(cursor.lastrowid)
+        self.invalidate_user(user_id)
+        return user_id
+
+    def get_user_by_email(self, email: str) -> UserRow | None:
+        with self.connect() as conn:
+            return conn.execute(self.SQL_GET_BY_EMAIL, (email,)).fetchone()
+
+    def get_user_by_id(self, user_id: int) -> UserRow | None:
+        now = time.monotonic()
+        with self._user_cache_lock:
+            entry = self._user_cache.get(user_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._user_cache.move_to_end(user_id)
+                    return entry[1]
+                del self._user_cache[user_id]
+
+        with self.connect() as conn:
+            row = conn.execute(self.SQL_GET_BY_ID, (user_id,)).fetchone()
+        if row is None:
+            return None
+        with self._user_cache_lock:
+            self._user_cache[user_id] = (now + self._user_cache_ttl, row)
+            self._user_cache.move_to_end(user_id)
+            while len(self._user_cache) > self._user_cache_size:
+                self._user_cache.popitem(last=False)
+        return row
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._user_cache_lock:
+            self._user_cache.pop(user_id, None)
+
+    def enqueue_email(self, *, recipient: str, subject: str, body: str, reply_to: str | None) -> int:
+        with self.connect() as conn:
+            cursor = conn.execute(self.SQL_INSERT_OUTBOX, (recipient, subject, body, reply_to))
+        return int(cursor.lastrowid)
+
+    def _claim_window(self) -> str:
+        return f"-{self.OUTBOX_CLAIM_TIMEOUT_SECONDS} seconds"
+
+    def claim_email(self, email_id: int) -> int | None:
         with self.connect() as conn:
             cursor = conn.execute(
-                "INSERT INTO users (email, password_hash, display_name) VALUES (?, ?, ?)",
-                (email, password_hash, display_name),
+                self.SQL_CLAIM_OUTBOX, (email_id, self.OUTBOX_MAX_ATTEMPTS, self._claim_window())
             )
-            conn.commit()
-            return int(cursor.lastrowid)
+            if cursor.rowcount != 1:
+                return None
+            return int(conn.execute(self.SQL_GET_OUTBOX_ATTEMPTS, (email_id,)).fetchone()[0])
+
+    def release_email(self, email_id: int) -> None:
+        with self.connect() as conn:
+            conn.execute(self.SQL_RELEASE_OUTBOX, (email_id,))
 
-    def get_user_by_email(self, email: str) -> sqlite3.Row | None:
+    def mark_email_sent(self, email_id: int) -> None:
         with self.connect() as conn:
-            cursor = conn.execute("SELECT * FROM users WHERE email = ?", (email,))
-            return cursor.fetchone()
+            conn.execute(self.SQL_MARK_OUTBOX_SENT, (email_id,))
 
-    def get_user_by_id(self, user_id: int) -> sqlite3.Row | None:
+    def get_pending_emails(self) -> list[tuple[int, str, str, str, str | None]]:
         with self.connect() as conn:
-            cursor = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-            return cursor.fetchone()
+            return conn.execute(
+                self.SQL_GET_PENDING_OUTBOX, (self.OUTBOX_MAX_ATTEMPTS, self._claim_window())
+            ).fetchall()
 
 
-__all__ = ["Database"]
+__all__ = ["Database", "UserRow"]
@@ -1,16 +1,123 @@
 from __future__ import annotations
 
+import os
+import queue
 import smtplib
+import threading
+import time
 from email.message import EmailMessage
-from email.utils import formataddr
 
 from .config import AppConfig
 
+SMTP_POOL_SIZE = 8
+SMTP_KEEPALIVE_SECONDS = 60.0
+
+_SMTP_POOLS: dict[tuple[str, int, str, bool], queue.Queue[smtplib.SMTP]] = {}
+_SMTP_POOLS_LOCK = threading.Lock()
+_keepalive_thread: threading.Thread | None = None
+
 
 class EmailConfigurationError(RuntimeError):
     pass
 
 
+def _reset_after_fork() -> None:
+    global _SMTP_POOLS, _SMTP_POOLS_LOCK, _keepalive_thread
+    for pool in _SMTP_POOLS.values():
+        for smtp in pool.queue:
+            try:
+                smtp.close()
+            except OSError:
+                pass
+    _SMTP_POOLS = {}
+    _SMTP_POOLS_LOCK = threading.Lock()
+    _keepalive_thread = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_pool(config: AppConfig) -> queue.Queue[smtplib.SMTP]:
+    global _keepalive_thread
+    key = (config.smtp_host, config.smtp_port, config.smtp_username, config.smtp_use_tls)
+    with _SMTP_POOLS_LOCK:
+        pool = _SMTP_POOLS.get(key)
+        if pool is None:
+            pool = _SMTP_POOLS[key] = queue.Queue(maxsize=SMTP_POOL_SIZE)
+        if _keepalive_thread is None:
+            _keepalive_thread = threading.Thread(target=_keepalive_loop, name="jmail-smtp-keepalive", daemon=True)
+            _keepalive_thread.start()
+    return pool
+
+
+def _connect(config: AppConfig) -> smtplib.SMTP:
+    if config.smtp_use_tls:
+        smtp = smtplib.SMTP(config.smtp_host, config.smtp_port)
+    else:
+        smtp = smtplib.SMTP_SSL(config.smtp_host, config.smtp_port)
+    try:
+        if config.smtp_use_tls:
+            smtp.starttls()
+        smtp.login(config.smtp_username, config.smtp_password)
+    except BaseException:
+        smtp.close()
+        raise
+    return smtp
+
+
+def _is_alive(smtp: smtplib.SMTP) -> bool:
+    try:
+        return smtp.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _checkout(pool: queue.Queue[smtplib.SMTP], config: AppConfig) -> smtplib.SMTP:
+    while True:
+        try:
+            smtp = pool.get_nowait()
+        except queue.Empty:
+            return _connect(config)
+        if _is_alive(smtp):
+            return smtp
+        smtp.close()
+
+
+def _checkin(pool: queue.Queue[smtplib.SMTP], smtp: smtplib.SMTP) -> None:
+    try:
+        pool.put_nowait(smtp)
+    except queue.Full:
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+
+def _keepalive_loop() -> None:
+    while True:
+        time.sleep(SMTP_KEEPALIVE_SECONDS)
+        with _SMTP_POOLS_LOCK:
+            pools = list(_SMTP_POOLS.values())
+        for pool in pools:
+            for _ in range(pool.qsize()):
+                try:
+                    smtp = pool.get_nowait()
+                except queue.Empty:
+                    break
+                if _is_alive(smtp):
+                    _checkin(pool, smtp)
+                else:
+                    smtp.close()
+
+
+def ensure_email_configured(config: AppConfig) -> None:
+    if not config.smtp_host or not config.smtp_username or not config.smtp_password:
+        raise EmailConfigurationError(
+            "SMTP credentials are not configured. Set SMTP_HOST, SMTP_USERNAME, and SMTP_PASSWORD."
+        )
+
+
 def send_email(
     *,
     config: AppConfig,
@@ -19,28 +126,24 @@ def send_email(
     body: str,
     reply_to: str | None = None,
 ) -> None:
-    if not config.smtp_host or not config.smtp_username or not config.smtp_password:
-        raise EmailConfigurationError(
-            "SMTP credentials are not configured. Set SMTP_HOST, SMTP_USERNAME, and SMTP_PASSWORD."
-        )
+    ensure_email_configured(config)
 
     message = EmailMessage()
     message["Subject"] = subject
-    message["From"] = formataddr((config.smtp_from_name, config.smtp_from_email or config.smtp_username))
+    message["From"] = config.from_header
     message["To"] = recipient
     if reply_to:
         message["Reply-To"] = reply_to
     message.set_content(body)
 
-    if config.smtp_use_tls:
-        with smtplib.SMTP(config.smtp_host, config.smtp_port) as smtp:
-            smtp.starttls()
-            smtp.login(config.smtp_username, config.smtp_password)
-            smtp.send_message(message)
-    else:
-        with smtplib.SMTP_SSL(config.smtp_host, config.smtp_port) as smtp:
-            smtp.login(config.smtp_username, config.smtp_password)
-            smtp.send_message(message)
+    pool = _get_pool(config)
+    smtp = _checkout(pool, config)
+    try:
+        smtp.send_message(message)
+    except BaseException:
+        smtp.close()
+        raise
+    _checkin(pool, smtp)
 
 
-__all__ = ["send_email", "EmailConfigurationError"]
+__all__ = ["send_email", "ensure_email_configured", "EmailConfigurationError"]
@@ -3,63 +3,107 @@ from __future__ import annotations
 import json
 from dataclasses import dataclass
 from typing import Any, Callable
-from wsgiref.util import setup_testing_defaults
+
+try:  # pragma: no cover - optional accelerated backend
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def dumps_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class EnvironHeaders:
+    __slots__ = ("_environ",)
+
+    def __init__(self, environ: dict[str, Any]) -> None:
+        self._environ = environ
+
+    @staticmethod
+    def _key(name: str) -> str:
+        key = name.upper().replace("-", "_")
+        if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            return key
+        return f"HTTP_{key}"
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        return self._environ.get(self._key(name), default)
+
+    def __getitem__(self, name: str) -> str:
+        return self._environ[self._key(name)]
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._key(name) in self._environ
 
 
 @dataclass(slots=True)
 class Request:
     method: str
     path: str
-    headers: dict[str, str]
+    headers: EnvironHeaders
     body: bytes
 
     def json(self) -> dict[str, Any]:
         if not self.body:
             return {}
-        return json.loads(self.body.decode("utf-8"))
+        return loads_json(self.body)
+
+    def json_fields(self, *names: str) -> tuple[Any, ...]:
+        payload = self.json()
+        if not isinstance(payload, dict):
+            raise ValueError("JSON payload must be an object")
+        return tuple(payload.get(name) for name in names)
 
 
 @dataclass(slots=True)
 class Response:
     status: int
-    headers: dict[str, str]
+    headers: list[tuple[str, str]]
     body: bytes
 
 
+_STATUS_TEXT = {
+    200: "200 OK",
+    201: "201 Created",
+    202: "202 Accepted",
+    204: "204 No Content",
+    400: "400 Bad Request",
+    401: "401 Unauthorized",
+    404: "404 Not Found",
+    409: "409 Conflict",
+    500: "500 Internal Server Error",
+}
+_JSON_HEADER = ("Content-Type", "application/json")
+
+
 def json_response(payload: dict[str, Any], status: int = 200) -> Response:
-    return Response(status=status, headers={"Content-Type": "application/json"}, body=json.dumps(payload).encode("utf-8"))
+    body = dumps_json(payload)
+    return Response(status=status, headers=[_JSON_HEADER, ("Content-Length", str(len(body)))], body=body)
 
 
 def build_request(environ: dict[str, Any]) -> Request:
-    setup_testing_defaults(environ)
     method = environ.get("REQUEST_METHOD", "GET")
     path = environ.get("PATH_INFO", "/")
-    headers = {
-        key[5:].replace("_", "-").title(): value
-        for key, value in environ.items()
-        if key.startswith("HTTP_")
-    }
-    if "CONTENT_TYPE" in environ:
-        headers["Content-Type"] = environ["CONTENT_TYPE"]
+    headers = EnvironHeaders(environ)
     length = int(environ.get("CONTENT_LENGTH") or 0)
     body = environ["wsgi.input"].read(length) if length else b""
     return Request(method=method, path=path, headers=headers, body=body)
 
 
 def to_wsgi(response: Response) -> tuple[str, list[tuple[str, str]], bytes]:
-    status_text = {
-        200: "200 OK",
-        201: "201 Created",
-        204: "204 No Content",
-        400: "400 Bad Request",
-        401: "401 Unauthorized",
-        404: "404 Not Found",
-        409: "409 Conflict",
-        500: "500 Internal Server Error",
-    }.get(response.status, f"{response.status} Unknown")
-    headers = [(key, value) for key, value in response.headers.items()]
-    if "Content-Length" not in response.headers:
-        headers.append(("Content-Length", str(len(response.body))))
+    status_text = _STATUS_TEXT.get(response.status) or f"{response.status} Unknown"
+    headers = response.headers
+    if not any(key == "Content-Length" for key, _ in headers):
+        headers = [*headers, ("Content-Length", str(len(response.body)))]
     return status_text, headers, response.body
 
 
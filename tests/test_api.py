@@ -1,20 +1,25 @@
 from __future__ import annotations
 
+import dataclasses
 import io
 import json
 import os
+import queue
 import sys
 import tempfile
+import threading
+import time
 from collections import deque
 from pathlib import Path
 from typing import Any, Callable
+from wsgiref.util import setup_testing_defaults
 
 import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import jmail
-from jmail import AppConfig, create_app
+from jmail import AppConfig, auth, create_app, database, email_service
 
 
 class WSGIResponse:
@@ -31,7 +36,7 @@ class WSGIResponse:
         return json.loads(self.body.decode("utf-8"))
 
 
-def call_wsgi(app: Callable, method: str, path: str, *, json_payload: dict[str, Any] | None = None, headers: dict[str, str] | None = None) -> WSGIResponse:
+def call_wsgi(app: Callable, method: str, path: str, *, json_payload: Any = None, headers: dict[str, str] | None = None) -> WSGIResponse:
     headers = headers or {}
     body_bytes = b""
     environ: dict[str, Any] = {
@@ -50,6 +55,7 @@ def call_wsgi(app: Callable, method: str, path: str, *, json_payload: dict[str,
         environ["CONTENT_TYPE"] = "application/json"
     for key, value in headers.items():
         environ[f"HTTP_{key.upper().replace('-', '_')}"] = value
+    setup_testing_defaults(environ)
 
     status_holder: dict[str, Any] = {}
     header_holder: dict[str, Any] = {}
@@ -63,6 +69,18 @@ def call_wsgi(app: Callable, method: str, path: str, *, json_payload: dict[str,
     return WSGIResponse(status_holder["status"], header_holder["headers"], body)
 
 
+def register_and_send(app: Callable, email: str) -> WSGIResponse:
+    register_resp = call_wsgi(app, "POST", "/api/register", json_payload={"email": email, "password": "password123"})
+    token = register_resp.json()["token"]
+    return call_wsgi(
+        app,
+        "POST",
+        "/api/send",
+        json_payload={"to": "friend@example.com", "subject": "Hello", "body": "Hi"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+
 @pytest.fixture()
 def test_app():
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -80,6 +98,7 @@ def test_app():
         )
         app = create_app(config)
         yield app
+        app.close()
 
 
 def test_register_and_login_flow(monkeypatch, test_app):
@@ -126,8 +145,11 @@ def test_register_and_login_flow(monkeypatch, test_app):
         },
         headers={"Authorization": f"Bearer {token}"},
     )
-    assert send_resp.status_code == 200
+    assert send_resp.status_code == 202
+    assert send_resp.json() == {"status": "queued"}
+    test_app.flush_outbox()
     assert sent_messages
+    assert not test_app.db.get_pending_emails()
 
 
 def test_send_email_requires_auth(test_app):
@@ -148,3 +170,261 @@ def test_invalid_email_registration(test_app):
         json_payload={"email": "invalid", "password": "password123"},
     )
     assert resp.status_code == 400
+
+
+def test_user_lookup_is_cached(test_app):
+    user_id = test_app.db.create_user(email="bob@example.com", password_hash="x$y", display_name="Bob")
+    first = test_app.db.get_user_by_id(user_id)
+    assert first is not None and first[1] == "bob@example.com"
+    assert test_app.db.get_user_by_id(user_id) is first
+
+    test_app.db.invalidate_user(user_id)
+    assert test_app.db.get_user_by_id(user_id) is not first
+
+
+def test_health_and_unknown_routes(test_app):
+    resp = call_wsgi(test_app, "GET", "/api/health")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok"}
+
+    assert call_wsgi(test_app, "POST", "/api/health").status_code == 404
+    assert call_wsgi(test_app, "GET", "/api/missing").status_code == 404
+
+
+def test_login_rejects_non_object_payload(test_app):
+    resp = call_wsgi(test_app, "POST", "/api/login", json_payload=["alice@example.com", "password123"])
+    assert resp.status_code == 400
+    assert resp.json()["error"] == "Invalid JSON payload"
+
+
+def test_send_email_reuses_smtp_connection(monkeypatch, test_app):
+    connections = []
+
+    class FakeSMTP:
+        def __init__(self, host: str, port: int) -> None:
+            self.sent = []
+            connections.append(self)
+
+        def starttls(self) -> None:
+            pass
+
+        def login(self, username: str, password: str) -> None:
+            pass
+
+        def noop(self) -> tuple[int, bytes]:
+            return 250, b"OK"
+
+        def send_message(self, message) -> None:
+            self.sent.append(message)
+
+        def close(self) -> None:
+            pass
+
+    monkeypatch.setattr(email_service.smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(email_service, "_SMTP_POOLS", {})
+    monkeypatch.setattr(email_service, "_keepalive_thread", None)
+    monkeypatch.setattr(email_service, "_keepalive_loop", lambda: None)
+
+    for subject in ("First", "Second"):
+        email_service.send_email(config=test_app.config, recipient="friend@example.com", subject=subject, body="Hi")
+
+    assert len(connections) == 1
+    assert [message["Subject"] for message in connections[0].sent] == ["First", "Second"]
+
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_smtp_pool_is_reset_in_forked_child(monkeypatch):
+    class FakeSMTP:
+        closed = False
+
+        def close(self) -> None:
+            self.closed = True
+
+    inherited = FakeSMTP()
+    pool = queue.Queue()
+    pool.put(inherited)
+    monkeypatch.setattr(email_service, "_SMTP_POOLS", {("smtp.test", 587, "sender", True): pool})
+    monkeypatch.setattr(email_service, "_keepalive_thread", threading.Thread(target=lambda: None))
+
+    pid = os.fork()
+    if pid == 0:
+        reset = email_service._SMTP_POOLS == {} and email_service._keepalive_thread is None
+        os._exit(0 if reset and inherited.closed else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert not inherited.closed
+    assert email_service._SMTP_POOLS == {("smtp.test", 587, "sender", True): pool}
+
+
+def test_database_connections_are_pooled_across_threads(monkeypatch, test_app):
+    opened = []
+    real_connect = database.sqlite3.connect
+
+    def counting_connect(*args, **kwargs):
+        opened.append(args)
+        return real_connect(*args, **kwargs)
+
+    monkeypatch.setattr(database.sqlite3, "connect", counting_connect)
+    call_wsgi(
+        test_app,
+        "POST",
+        "/api/register",
+        json_payload={"email": "carol@example.com", "password": "password123"},
+    )
+
+    def login() -> None:
+        call_wsgi(
+            test_app,
+            "POST",
+            "/api/login",
+            json_payload={"email": "carol@example.com", "password": "password123"},
+        )
+
+    for _ in range(5):
+        thread = threading.Thread(target=login)
+        thread.start()
+        thread.join()
+
+    assert opened == []
+
+
+
+def test_database_pool_keeps_first_connection_after_fork(test_app):
+    db = test_app.db
+    db._pool_pid = -1
+    db.get_user_by_email("nobody@example.com")
+
+    assert db._pool_opened == 1
+    assert db._pool.qsize() == 1
+
+
+def test_pending_email_is_sent_once_across_apps(monkeypatch, test_app):
+    sent_messages = deque()
+
+    def slow_send(**kwargs):
+        time.sleep(0.05)
+        sent_messages.append(kwargs)
+
+    monkeypatch.setattr(jmail, "send_email", slow_send)
+    test_app.db.enqueue_email(recipient="friend@example.com", subject="Hello", body="Hi", reply_to=None)
+
+    workers = [create_app(test_app.config) for _ in range(3)]
+    for app in workers:
+        app.flush_outbox()
+        app.close()
+
+    assert len(sent_messages) == 1
+    assert not test_app.db.get_pending_emails()
+
+
+def test_failed_email_is_retried_with_backoff(monkeypatch, test_app):
+    attempts = []
+
+    def flaky_send(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) == 1:
+            raise OSError("connection reset")
+
+    monkeypatch.setattr(jmail, "send_email", flaky_send)
+    monkeypatch.setattr(jmail.JmailApplication, "SEND_RETRY_DELAY_SECONDS", 0.01)
+    assert register_and_send(test_app, "erin@example.com").status_code == 202
+    test_app.flush_outbox()
+
+    assert len(attempts) == 2
+    assert not test_app.db.get_pending_emails()
+
+
+def test_failed_email_gives_up_after_max_attempts(monkeypatch, test_app):
+    attempts = []
+
+    def failing_send(**kwargs):
+        attempts.append(kwargs)
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(jmail, "send_email", failing_send)
+    monkeypatch.setattr(jmail.JmailApplication, "SEND_RETRY_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(jmail.Database, "OUTBOX_MAX_ATTEMPTS", 3)
+    assert register_and_send(test_app, "dave@example.com").status_code == 202
+    test_app.flush_outbox()
+
+    assert len(attempts) == 3
+    assert not test_app.db.get_pending_emails()
+
+
+@pytest.mark.parametrize(
+    ("address", "valid"),
+    [
+        ("a@b.c", True),
+        ("@b.c", False),
+        ("a@.b", False),
+        ("a@b.", False),
+        ("a@@b.c", False),
+        ("a b@c.d", False),
+        ("a@b.c\n", False),
+    ],
+)
+def test_validate_email(address, valid):
+    if valid:
+        assert auth.validate_email(address) == address
+    else:
+        with pytest.raises(ValueError):
+            auth.validate_email(address)
+
+
+def test_token_cache_respects_expiry_and_secret(monkeypatch, test_app):
+    config = test_app.config
+    token = auth.generate_token(user_id=1, config=config)
+    payload = auth.decode_token(token, config=config)
+    assert auth.decode_token(token, config=config) is payload
+
+    other_config = dataclasses.replace(config, jwt_secret="other-secret")
+    with pytest.raises(ValueError, match="Invalid signature"):
+        auth.decode_token(token, config=other_config)
+
+    monkeypatch.setattr(auth.time, "time", lambda: payload["exp"] + 1)
+    with pytest.raises(ValueError, match="Token expired"):
+        auth.decode_token(token, config=config)
+
+
+def test_workers_restart_once_after_fork(monkeypatch, test_app):
+    old_queue, old_thread, old_pool = test_app._send_queue, test_app._send_thread, test_app._kdf_pool
+    starts = []
+    start_workers = jmail.JmailApplication._start_workers
+
+    def counting_start(app):
+        starts.append(app)
+        time.sleep(0.05)
+        start_workers(app)
+
+    monkeypatch.setattr(jmail.JmailApplication, "_start_workers", counting_start)
+    test_app._pid = -1
+    barrier = threading.Barrier(8)
+
+    def first_request() -> None:
+        barrier.wait()
+        test_app._ensure_workers()
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(starts) == 1
+    assert test_app._send_queue is not old_queue
+    old_queue.put(None)
+    old_thread.join()
+    old_pool.shutdown()
+
+
+@pytest.mark.parametrize("segment", ["ab=c", "a*b"])
+def test_malformed_token_segment_is_rejected(test_app, segment):
+    token = auth.generate_token(user_id=1, config=test_app.config)
+    header_b64, payload_b64, _ = token.split(".")
+
+    with pytest.raises(ValueError):
+        auth._b64decode(segment)
+    with pytest.raises(ValueError):
+        auth.decode_token(f"{header_b64}.{payload_b64}.{segment}", config=test_app.config)